@@ -2,63 +2,178 @@ import streamlit as st
 st.set_page_config(layout="wide", page_title="VKGQA")
 import pandas as pd
 import networkx as nx
-from pyvis.network import Network
-
+from networkx.algorithms.community import louvain_communities
+
+import colorsys
+import csv
+import hashlib
+import io
+import json
+import math
+import os
 import re
-import seaborn as sns
-from networkx.algorithms import community as nx_community
-import community.community_louvain as community_louvain
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from gn import girvan_newman_first_split
+
+_HTML_START_RE = re.compile(r"<html.*?>", re.I)
+
+# Rows of the upload shown in the Data Preview table
+PREVIEW_ROWS = 50
+
+# Node size and edge width PyVis' from_nx would have filled in
+DEFAULT_NODE_SIZE = 10
+DEFAULT_EDGE_WIDTH = 1
+
+# Components with at least this many edges are split by Girvan–Newman in
+# worker processes when there is more than one of them
+GN_PARALLEL_MIN_EDGES = 200
+
+# Server-side layout: networkx switches from its vectorized spring layout
+# to a much slower scipy/pure-Python one at 500 nodes
+LAYOUT_MAX_NODES = 500
+LAYOUT_SCALE = 1000
+LAYOUT_SEED = 42
+
+# Graphs with at least this many nodes are drawn with sigma.js (WebGL)
+# instead of the interactive vis.js view
+WEBGL_MIN_NODES = 5000
+SIGMA_NODE_SIZE = 3
+
+# Seed for Louvain community detection so repeated runs color alike
+LOUVAIN_SEED = 42
+
+# Cached parses and rendered pages kept per server process; a rendered
+# page can run to several MB
+DATAFRAME_CACHE_ENTRIES = 4
+GRAPH_CACHE_ENTRIES = 8
 
 def create_graph_from_csv(df, node1_col, edge_col, node2_col):
     """
     Given a DataFrame and the names of the columns that correspond 
     to node_1, edge, node_2, build a NetworkX graph.
     """
+    # Strip all three columns with pandas' string kernels; na_value keeps
+    # the old str(nan) == "nan" node for missing cells.
+    cols = df[[node1_col, edge_col, node2_col]].astype("string").apply(lambda s: s.str.strip())
+    node1, edge_labels, node2 = (cols.iloc[:, i].to_numpy(dtype=object, na_value="nan")
+                                 for i in range(3))
+
     G = nx.Graph()
-    for _, row in df.iterrows():
-        node1 = str(row[node1_col]).strip()
-        node2 = str(row[node2_col]).strip()
-        edge_label = str(row[edge_col]).strip()
-
-        G.add_node(node1)
-        G.add_node(node2)
-        # Store the relationship in 'title' so PyVis can display it on hover
-        G.add_edge(node1, node2, title=edge_label)
+    # Store the relationship in 'title' so PyVis can display it on hover;
+    # add_edges_from adds any missing nodes on the way.
+    G.add_edges_from(zip(node1, node2, ({"title": t} for t in edge_labels)))
     return G
 
+@lru_cache(maxsize=256)
+def _hls_palette(n, lightness=0.6, saturation=0.65):
+    """
+    Return n evenly spaced hex colors around the HLS hue circle, the same
+    colors as seaborn's color_palette("hls", n).as_hex().  Memoized on n,
+    so the tuple is shared and must not be mutated.
+    """
+    return tuple(
+        "#" + "".join(format(round(c * 255), "02x")
+                      for c in colorsys.hls_to_rgb((i / n + 0.01) % 1, lightness, saturation))
+        for i in range(n)
+    )
+
 def color_communities_girvan_newman(G):
     """
     Detect communities using Girvan–Newman and assign each community
     a unique color.  Modifies G in-place by setting G.nodes[node]['color'].
+    Each connected component is split on its own, since betweenness never
+    crosses components.
     """
-    communities_generator = nx_community.girvan_newman(G)
-    top_level_communities = next(communities_generator)
+    top_level_communities = []
+    large_components = []
+    for component in nx.connected_components(G):
+        sub = G.subgraph(component)
+        if sub.number_of_edges() >= GN_PARALLEL_MIN_EDGES:
+            large_components.append(sub.copy())
+        else:
+            top_level_communities.extend(girvan_newman_first_split(sub))
+
+    # Components are independent, so the big ones can be split in parallel;
+    # small ones are not worth the cost of shipping them to a worker.
+    if len(large_components) > 1:
+        max_workers = min(len(large_components), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for split in pool.map(girvan_newman_first_split, large_components):
+                top_level_communities.extend(split)
+    else:
+        for sub in large_components:
+            top_level_communities.extend(girvan_newman_first_split(sub))
     communities_list = sorted(map(sorted, top_level_communities))
 
-    palette = sns.color_palette("hls", len(communities_list)).as_hex()
-    for idx, community_nodes in enumerate(communities_list):
-        color = palette[idx]
-        for node in community_nodes:
-            G.nodes[node]['color'] = color
+    palette = _hls_palette(len(communities_list))
+    color_map = {node: palette[idx]
+                 for idx, community_nodes in enumerate(communities_list)
+                 for node in community_nodes}
+    nx.set_node_attributes(G, color_map, name='color')
     return G
 
 def color_communities_louvain(G):
-    partition = community_louvain.best_partition(G)
-    comm_dict = {}
-    for node, comm_id in partition.items():
-        comm_dict.setdefault(comm_id, []).append(node)
-
-    communities_list = list(comm_dict.values())
-    palette = sns.color_palette("hls", len(communities_list)).as_hex()
-
-    for idx, community_nodes in enumerate(communities_list):
-        color = palette[idx]
-        for node in community_nodes:
-            G.nodes[node]['color'] = color
+    """
+    Detect communities using Louvain modularity optimization and assign
+    each community a unique color.  Modifies G in-place.
+    """
+    # Run on each connected component separately.  A fixed seed keeps the
+    # partition, and so the colors, stable across reruns.
+    communities_list = []
+    for component in nx.connected_components(G):
+        communities_list.extend(louvain_communities(G.subgraph(component), seed=LOUVAIN_SEED))
+    palette = _hls_palette(len(communities_list))
+
+    color_map = {node: palette[idx]
+                 for idx, community_nodes in enumerate(communities_list)
+                 for node in community_nodes}
+    nx.set_node_attributes(G, color_map, name='color')
 
     return G
 
-def draw_graph_with_lasso_and_textbox(G, output_html="graph_lasso.html"):
+def compute_layout(G):
+    """
+    Spring-layout G server-side, scaled to vis.js canvas units.  Returns
+    None for graphs of LAYOUT_MAX_NODES or more, where networkx leaves its
+    vectorized solver and the browser's Barnes–Hut simulation is faster.
+    """
+    if G.number_of_nodes() >= LAYOUT_MAX_NODES:
+        return None
+    return nx.spring_layout(G, seed=LAYOUT_SEED, scale=LAYOUT_SCALE)
+
+def community_layout(G):
+    """
+    O(n) layout for graphs too large for spring_layout.  Each community
+    (nodes sharing a color) is packed into a sunflower disc, best-connected
+    nodes in the middle, and the discs sit side by side around a circle.
+    """
+    groups = defaultdict(list)
+    for node, color in G.nodes(data="color"):
+        groups[color].append(node)
+    groups = sorted(groups.values(), key=len, reverse=True)
+
+    # Disc radius grows with sqrt(size) so every node gets the same area;
+    # the ring is just long enough to fit all the discs' diameters.
+    radii = [math.sqrt(len(nodes)) for nodes in groups]
+    ring = sum(radii) / math.pi
+    golden_angle = math.pi * (3 - math.sqrt(5))
+
+    pos = {}
+    angle = 0.0
+    for nodes, radius in zip(groups, radii):
+        angle += radius / ring
+        cx, cy = ring * math.cos(angle), ring * math.sin(angle)
+        for i, node in enumerate(sorted(nodes, key=G.degree, reverse=True)):
+            r, theta = math.sqrt(i + 0.5), i * golden_angle
+            pos[node] = (cx + r * math.cos(theta), cy + r * math.sin(theta))
+        angle += radius / ring
+    return pos
+
+def draw_graph_with_lasso_and_textbox(G, output_html=None):
     """
     1) Builds a PyVis network with "physics" sliders on the right (#config).
     2) Lasso selection => black border, borderWidth=5 (reverts old selection).
@@ -67,8 +182,18 @@ def draw_graph_with_lasso_and_textbox(G, output_html="graph_lasso.html"):
     4) Revert => background=original color, border=slightly darker color
        so we can distinguish the border from the fill.
     5) If lasso is off => re-enable normal canvas panning/zoom; if on => freeze.
+
+    Returns the final HTML as a string; it is only written to disk when
+    output_html is given.
     """
 
+    from lxml import html as lhtml
+    from pyvis.network import Network
+
+    def _to_html(elem):
+        # Serialize a single element, without the text that trails it
+        return lhtml.tostring(elem, encoding="unicode", with_tail=False)
+
     # ~~~~~ Step A: Capture original node color so we can revert later ~~~~~
     nodeColors = {}
     for node, data in G.nodes(data=True):
@@ -77,26 +202,44 @@ def draw_graph_with_lasso_and_textbox(G, output_html="graph_lasso.html"):
         nodeColors[node] = data['color']  # can be a hex string or {border:..., background:...} dict
 
     # Build the PyVis
+    # from_nx re-adds both endpoints of every edge and scans all existing
+    # edges for a duplicate on each add_edge.  G is already a simple graph,
+    # so add each node once and hand PyVis the edge dicts directly.
     net = Network(height="750px", width="100%", notebook=False, cdn_resources="remote")
-    net.from_nx(G)
+    # Start nodes at their precomputed positions, when we have them, so the
+    # browser does not have to simulate the layout from a random start
+    pos = compute_layout(G)
+    for node, data in G.nodes(data=True):
+        attrs = {"size": DEFAULT_NODE_SIZE, **data}
+        if pos is not None:
+            attrs["x"], attrs["y"] = (float(c) for c in pos[node])
+        net.add_node(node, **attrs)
+    if pos is not None:
+        # Already laid out, so skip the client-side simulation; the physics
+        # panel can still switch it back on
+        net.toggle_physics(False)
+    net.edges.extend({**data, "width": DEFAULT_EDGE_WIDTH, "from": u, "to": v}
+                     for u, v, data in G.edges(data=True))
     net.show_buttons(filter_=["physics"])
-    net.save_graph(output_html)
+    original_html = net.generate_html(notebook=False)
 
-    with open(output_html, "r", encoding="utf-8") as f:
-        original_html = f.read()
+    # Parse once and pull every piece we need out of the same tree.
+    # huge_tree: without it libxml2 silently drops text nodes over ~10 MB,
+    # which is where PyVis inlines the node/edge data for big graphs.
+    tree = lhtml.fromstring(original_html, parser=lhtml.HTMLParser(huge_tree=True))
 
-    head_match = re.search(r"(?s)<head>(.*?)</head>", original_html, re.IGNORECASE)
-    head_content = head_match.group(1) if head_match else ""
+    # PyVis puts a <center> inside <head>, which makes the parser open <body>
+    # early; the <link>/<style> tags that follow it still belong in the head.
+    head_elems = tree.xpath("/html/head/* | /html/body/link | /html/body/style")
+    head_content = "".join(_to_html(el) for el in head_elems)
 
-    script_regex = re.compile(r"(?s)<script.*?>.*?</script>", re.IGNORECASE)
-    scripts = script_regex.findall(original_html)
-    no_scripts = script_regex.sub("", original_html)
+    scripts = [_to_html(el) for el in tree.xpath("//script")]
 
-    netw_match = re.search(r'(?s)(<div[^>]+id="mynetwork"[^>]*>.*?</div>)', no_scripts, re.IGNORECASE)
-    mynetwork_html = netw_match.group(1) if netw_match else "<div>CouldNotFind_mynetwork</div>"
+    netw_elem = tree.get_element_by_id("mynetwork", None)
+    mynetwork_html = _to_html(netw_elem) if netw_elem is not None else "<div>CouldNotFind_mynetwork</div>"
 
-    cfg_match = re.search(r'(?s)(<div[^>]+id="config"[^>]*>.*?</div>)', no_scripts, re.IGNORECASE)
-    config_html = cfg_match.group(1) if cfg_match else "<div>CouldNotFind_config</div>"
+    cfg_elem = tree.get_element_by_id("config", None)
+    config_html = _to_html(cfg_elem) if cfg_elem is not None else "<div>CouldNotFind_config</div>"
 
     # ~~~~~ Step B: Minimal CSS for layout + overlay ~~~~~
     custom_css = """
@@ -167,8 +310,9 @@ def draw_graph_with_lasso_and_textbox(G, output_html="graph_lasso.html"):
 </style>
 """
 
-    # Convert Python dict of nodeColors => a JSON-like string we can parse in JS
-    node_colors_json = repr(nodeColors)
+    # Convert Python dict of nodeColors => a JSON object literal for the JS;
+    # escape "</" so a node name can't close the <script> it lands in
+    node_colors_json = json.dumps(nodeColors, separators=(",", ":")).replace("</", "<\\/")
 
     # ~~~~~ Step C: JavaScript ~~~~~
     # We only change where we append the #toolbar: now it goes in #rightPane.
@@ -253,7 +397,10 @@ document.addEventListener("DOMContentLoaded", function() {{
     var selectedNodeIDs=[];
 
     function logStatus(msg){{
-      statusBox.innerHTML+= msg+"<br/>";
+      // Append nodes instead of innerHTML+=, which re-parses the whole log
+      let frag = document.createDocumentFragment();
+      frag.append(msg, document.createElement("br"));
+      statusBox.appendChild(frag);
       statusBox.scrollTop = statusBox.scrollHeight;
     }}
 
@@ -309,14 +456,41 @@ document.addEventListener("DOMContentLoaded", function() {{
         revertNodes(oldGoldNodes);
         oldGoldNodes=[];
 
-        let nodeIDs = net.body.data.nodes.getIds();
+        // Flatten the lasso into typed arrays and take its bounding box once
+        let nPoly = lassoPoints.length;
+        let polyX = new Float32Array(nPoly);
+        let polyY = new Float32Array(nPoly);
+        let minX=Infinity, maxX=-Infinity, minY=Infinity, maxY=-Infinity;
+        for(let i=0; i<nPoly; i++){{
+          let px=lassoPoints[i].x, py=lassoPoints[i].y;
+          polyX[i]=px; polyY[i]=py;
+          if(px<minX) minX=px; if(px>maxX) maxX=px;
+          if(py<minY) minY=py; if(py>maxY) maxY=py;
+        }}
+
+        // Fetch every position at once and map canvas => overlay coords with
+        // one affine transform, instead of a canvasToDOM call per node
+        let positions = net.getPositions();
+        let nodeIDs = Object.keys(positions);
+        let nodeX = new Float32Array(nodeIDs.length);
+        let nodeY = new Float32Array(nodeIDs.length);
+        let cRect = container.getBoundingClientRect();
+        let scale = net.getScale();
+        let view = net.getViewPosition();
+        for(let k=0; k<nodeIDs.length; k++){{
+          let p = positions[nodeIDs[k]];
+          nodeX[k] = (p.x-view.x)*scale + cRect.width/2;
+          nodeY[k] = (p.y-view.y)*scale + cRect.height/2;
+        }}
+
+        // Cheap bounding-box reject first; only nodes inside the box get
+        // the full crossings test
         let newlySelected=[];
-        for(let nid of nodeIDs){{
-          let posObj = net.getPositions(nid);
-          let domPos = net.canvasToDOM(posObj[nid]);
-          let overlayPos = toOverlay(domPos.x, domPos.y);
-          if(isInsidePolygon(overlayPos, lassoPoints)){{
-            newlySelected.push(nid);
+        for(let k=0; k<nodeIDs.length; k++){{
+          let x=nodeX[k], y=nodeY[k];
+          if(x<minX || x>maxX || y<minY || y>maxY) continue;
+          if(isInsidePolygon(x, y, polyX, polyY)){{
+            newlySelected.push(nodeIDs[k]);
           }}
         }}
         selectedNodeIDs = newlySelected.slice();
@@ -348,22 +522,24 @@ document.addEventListener("DOMContentLoaded", function() {{
     }});
 
     // ~~~~~ HELPER FUNCS ~~~~~
+    // Both helpers size the update array up front and send it to the
+    // DataSet in a single update() call
     function highlightNodes(nids, bw, borderC){{
-      let ups=[];
-      for(let nid of nids){{
-        let obj={{id:nid}};
+      let ups=new Array(nids.length);
+      for(let i=0; i<nids.length; i++){{
+        let obj={{id:nids[i]}};
         if(bw!==null) obj.borderWidth=bw;
         if(borderC!==null) obj.color={{border:borderC}};
-        ups.push(obj);
+        ups[i]=obj;
       }}
       net.body.data.nodes.update(ups);
     }}
 
     function revertNodes(nids){{
-      let ups=[];
-      for(let nid of nids){{
-        let c = parseOriginalNodeColor(nid);
-        ups.push({{id:nid, borderWidth:1, color:c}});
+      let ups=new Array(nids.length);
+      for(let i=0; i<nids.length; i++){{
+        let c = parseOriginalNodeColor(nids[i]);
+        ups[i]={{id:nids[i], borderWidth:1, color:c}};
       }}
       net.body.data.nodes.update(ups);
     }}
@@ -392,17 +568,12 @@ document.addEventListener("DOMContentLoaded", function() {{
       return {{x:e.clientX-rect.left, y:e.clientY-rect.top}};
     }}
 
-    function toOverlay(docX, docY){{
-      let cRect = container.getBoundingClientRect();
-      return {{x:docX-cRect.left, y:docY-cRect.top}};
-    }}
-
-    function isInsidePolygon(pt, poly){{
+    function isInsidePolygon(x, y, polyX, polyY){{
       let inside=false;
-      for(let i=0,j=poly.length-1; i<poly.length; j=i++){{
-        let xi=poly[i].x, yi=poly[i].y;
-        let xj=poly[j].x, yj=poly[j].y;
-        let inter=((yi>pt.y)!=(yj>pt.y)) && (pt.x<(xj-xi)*(pt.y-yi)/(yj-yi)+xi);
+      for(let i=0,j=polyX.length-1; i<polyX.length; j=i++){{
+        let xi=polyX[i], yi=polyY[i];
+        let xj=polyX[j], yj=polyY[j];
+        let inter=((yi>y)!=(yj>y)) && (x<(xj-xi)*(y-yi)/(yj-yi)+xi);
         if(inter) inside=!inside;
       }}
       return inside;
@@ -411,46 +582,123 @@ document.addEventListener("DOMContentLoaded", function() {{
 </script>
 """
 
-    left_pane_html = f'''
-<div id="leftPane">
-  {mynetwork_html}
-</div>
-'''
-
-    custom_body = f"""
-<body>
-{custom_css}
-<div id="flexContainer">
-  {left_pane_html}
-  <div id="rightPane">
-    {config_html}
-    <!-- We now place the toolbar here, after #config, at runtime in JS. -->
-  </div>
-</div>
-{''.join(scripts)}
-{custom_js}
-</body>
-"""
-
-    html_start = re.search(r"(?i)<html.*?>", original_html)
+    html_start = _HTML_START_RE.search(original_html)
     if html_start:
         start_tag = html_start.group(0)
     else:
         start_tag = "<html>"
-    final_html = f"""
-{start_tag}
-<head>
-{head_content}
-</head>
-{custom_body}
-</html>
-"""
 
-    with open(output_html, "w", encoding="utf-8") as f:
-        f.write(final_html)
+    # Assemble the page from a flat list and join once, rather than nesting
+    # f-strings that each copy the (possibly multi-MB) PyVis output.
+    # Our CSS and JS go in <head>, so the body is laid out once with its
+    # final styles; custom_js waits for DOMContentLoaded, by which point the
+    # PyVis scripts at the end of <body> have created window.network.
+    final_html = "".join([
+        start_tag,
+        "\n<head>\n", head_content, custom_css, custom_js, "\n</head>\n",
+        "<body>\n",
+        '<div id="flexContainer">\n<div id="leftPane">\n', mynetwork_html, "\n</div>\n",
+        '<div id="rightPane">\n', config_html,
+        "\n<!-- We now place the toolbar here, after #config, at runtime in JS. -->\n",
+        "</div>\n</div>\n",
+        *scripts,
+        "</body>\n</html>\n",
+    ])
+
+    if output_html:
+        Path(output_html).write_text(final_html, encoding="utf-8")
+
+    return final_html
+
+def draw_graph_sigma(G):
+    """
+    Render G with sigma.js, which draws through WebGL and stays responsive
+    on graphs far larger than vis.js can animate.  Read-only: there is no
+    lasso, physics panel or question box in this view.
+    """
+    pos = community_layout(G)
+    graph_data = {
+        "nodes": [
+            {"key": node, "attributes": {"label": str(node), "x": pos[node][0], "y": pos[node][1],
+                                         "size": SIGMA_NODE_SIZE,
+                                         "color": data.get("color", "#97c2fc")}}
+            for node, data in G.nodes(data=True)
+        ],
+        "edges": [
+            {"source": u, "target": v, "undirected": True, "attributes": {"label": title}}
+            for u, v, title in G.edges(data="title", default="")
+        ],
+    }
+    # escape "</" so a node name can't close the <script> it lands in
+    graph_json = json.dumps(graph_data, separators=(",", ":")).replace("</", "<\\/")
+
+    return "".join([
+        '<html>\n<head>\n<meta charset="utf-8">\n',
+        '<script src="https://cdnjs.cloudflare.com/ajax/libs/graphology/0.25.4/graphology.umd.min.js"></script>\n',
+        '<script src="https://cdnjs.cloudflare.com/ajax/libs/sigma.js/2.4.0/sigma.min.js"></script>\n',
+        "<style>\n  body { margin: 0; }\n  #sigmaContainer { width: 100%; height: 750px; }\n</style>\n",
+        "</head>\n<body>\n",
+        '<div id="sigmaContainer"></div>\n',
+        "<script>\n",
+        "var graph = new graphology.Graph({type: \"undirected\"});\n",
+        "graph.import(", graph_json, ");\n",
+        'new Sigma(graph, document.getElementById("sigmaContainer"));\n',
+        "</script>\n</body>\n</html>\n",
+    ])
+
+
+@st.cache_data(show_spinner=False, max_entries=DATAFRAME_CACHE_ENTRIES)
+def load_dataframe(file_hash, _file_bytes, file_name):
+    """
+    Parse an uploaded file into a DataFrame.  CSVs are read as-is; anything
+    else is treated as TXT with one "n1|edge|n2" triplet per line.
 
-    return output_html
+    Cached on file_hash; the leading underscore keeps Streamlit from
+    hashing the raw bytes on every rerun.
+    """
+    if file_name.endswith(".csv"):
+        # pandas' C parser rather than the pyarrow engine: pyarrow rejects
+        # short rows, keeps duplicate headers unrenamed and guesses
+        # timestamps, all of which change the nodes the graph ends up with.
+        return pd.read_csv(io.BytesIO(_file_bytes))
+
+    # Assume it's .txt, e.g. "n1 | edge | n2", and let pandas' C reader
+    # split on '|'.  Fields past the third are ignored; quotes are kept
+    # as-is and "NA"/"null" stay strings, like a plain line.split('|').
+    columns = ["node_1","edge","node_2"]
+    try:
+        df = pd.read_csv(io.BytesIO(_file_bytes), sep="|", header=None,
+                         names=columns, usecols=[0, 1, 2], dtype=str,
+                         engine="c", quoting=csv.QUOTE_NONE, keep_default_na=False,
+                         encoding_errors="replace")
+    except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        # Empty file, or no line has all three fields
+        return pd.DataFrame(columns=columns)
+    df = df.apply(lambda col: col.str.strip())
+
+    # Malformed lines with fewer than three fields come back with empty
+    # trailing columns; skip anything without both endpoints
+    return df[(df["node_1"] != "") & (df["node_2"] != "")].reset_index(drop=True)
+
+@st.cache_data(show_spinner=False, max_entries=GRAPH_CACHE_ENTRIES)
+def build_graph_html(file_hash, _file_bytes, file_name, n_val,
+                     node1_col, edge_col, node2_col, use_girvan_newman=False):
+    """
+    Parse, build, color and render in one cached step, so reruns with the
+    same upload and the same column choices are a cache lookup.
+    """
+    df = load_dataframe(file_hash, _file_bytes, file_name)
+    if n_val > 0:
+        df = df.iloc[:n_val]
 
+    G = create_graph_from_csv(df, node1_col, edge_col, node2_col)
+    if use_girvan_newman:
+        G = color_communities_girvan_newman(G)
+    else:
+        G = color_communities_louvain(G)
+    if G.number_of_nodes() >= WEBGL_MIN_NODES:
+        return draw_graph_sigma(G)
+    return draw_graph_with_lasso_and_textbox(G)
 
 def main():
     st.title("Visual Knowledge Graph Question-Answering")
@@ -459,34 +707,12 @@ def main():
     # 1) Let the user upload either CSV or TXT
     uploaded_file = st.file_uploader("Upload CSV or TXT", type=["csv","txt"])
     if uploaded_file is not None:
-        # 2) Check extension or attempt to parse
-        #    If it's CSV, do your current logic
-        #    If it's TXT, parse each line as "n1|edge|n2"
-        import io
-        
+        # 2) Parse it; a digest of the content is the cache key, so reruns
+        #    with the same upload skip straight to the cached results
+        file_bytes = uploaded_file.getvalue()
+        file_hash = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
         file_name = uploaded_file.name.lower()
-        if file_name.endswith(".csv"):
-            # Normal CSV parse
-            df = pd.read_csv(uploaded_file)
-        else:
-            # Assume it's .txt
-            raw_text = uploaded_file.read().decode("utf-8", errors="replace")
-            lines = raw_text.splitlines()
-            
-            rows = []
-            for line in lines:
-                # Split by '|'
-                parts = line.split('|')
-                if len(parts) < 3:
-                    # If line is malformed, skip or handle gracefully
-                    continue
-                # e.g. "n1 | edge | n2"
-                node1 = parts[0].strip()
-                edge = parts[1].strip()
-                node2 = parts[2].strip()
-                rows.append([node1, edge, node2])
-            
-            df = pd.DataFrame(rows, columns=["node_1","edge","node_2"])
+        df = load_dataframe(file_hash, file_bytes, file_name)
 
         # 3) Let the user optionally limit how many rows (lines) to keep
         st.write("#### Optional: Number of lines to keep (for debug):")
@@ -495,14 +721,15 @@ def main():
         # Attempt to parse num_lines into an int
         try:
             n_val = int(num_lines)
-            if n_val > 0:
-                df = df.iloc[:n_val].copy()  # keep only the first n_val rows
         except ValueError:
-            pass  # if invalid or blank, we do nothing
+            n_val = 0  # if invalid or blank, we keep everything
+        preview_rows = PREVIEW_ROWS
+        if n_val > 0:
+            preview_rows = min(n_val, PREVIEW_ROWS)  # the preview never shows more than the debug row limit
 
-        # 4) Show preview
+        # 4) Show preview; only this slice is serialized to the browser
         st.write("### Data Preview")
-        st.dataframe(df.head())
+        st.dataframe(df.head(preview_rows))
 
         columns = list(df.columns)
         if len(columns) < 3:
@@ -514,15 +741,13 @@ def main():
         edge_col = st.selectbox("Select the 'edge' column", columns)
         node2_col = st.selectbox("Select the 'node_2' column", columns)
 
+        use_girvan_newman = st.checkbox("Use Girvan–Newman (slow)")
+
         if st.button("Generate Graph"):
-            G = create_graph_from_csv(df, node1_col, edge_col, node2_col)
-            G = color_communities_girvan_newman(G)
-            # or color_communities_louvain(G)
-            html_path = draw_graph_with_lasso_and_textbox(G, "graph_lasso.html")
+            html_code = build_graph_html(file_hash, file_bytes, file_name, n_val,
+                                         node1_col, edge_col, node2_col, use_girvan_newman)
 
             st.write("### Graph Visualization:")
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html_code = f.read()
             st.components.v1.html(html_code, height=1000, scrolling=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+import networkx as nx
+
+# Kept out of app.py so ProcessPoolExecutor workers can unpickle it by a
+# stable module path; Streamlit swaps __main__ on every script run.
+
+def girvan_newman_first_split(G):
+    """
+    Return the first level of the Girvan–Newman dendrogram as a tuple of
+    node sets.
+
+    A trimmed copy of networkx's ``girvan_newman``: the edge count is kept
+    in a local counter instead of being polled, edge betweenness is only
+    recomputed inside the component that contained the removed edge, and
+    we stop at the first split since that is all we ever consume.
+    """
+    if G.number_of_edges() == 0:
+        return tuple(nx.connected_components(G))
+
+    g = G.copy()
+    g.remove_edges_from(nx.selfloop_edges(g))
+    num_edges = g.number_of_edges()
+
+    # Unnormalized, so scores from different components stay comparable
+    betweenness = nx.edge_betweenness_centrality(g, normalized=False)
+    while num_edges > 0:
+        u, v = max(betweenness, key=betweenness.get)
+        g.remove_edge(u, v)
+        num_edges -= 1
+
+        component = nx.node_connected_component(g, u)
+        if v not in component:
+            break
+
+        betweenness = {e: b for e, b in betweenness.items() if e[0] not in component}
+        betweenness.update(
+            nx.edge_betweenness_centrality(g.subgraph(component), normalized=False)
+        )
+    return tuple(nx.connected_components(g))